@@ -1,14 +1,30 @@
+import re
+import sys
+
+# Instruction kinds used by the dispatch table built in Assembler.__init__.
+PSEUDO_ORG, PSEUDO_END, PSEUDO_DEC, PSEUDO_HEX, MRI, RRI, IOI = range(7)
+UNKNOWN = -1
+# dispatch entry of symbols that are not instructions.
+_UNKNOWN_ENTRY = (UNKNOWN, None)
+# format specs for 12-bit addresses and 16-bit instructions.
+_F12 = '012b'
+_F16 = '016b'
+# matches a comment: a symbol starting with '/' up to the end of its line.
+_COMMENT_RE = re.compile(r'(?<!\S)/[^\r\n]*')
+
+
 class Assembler(object):
     def __init__(self, asmpath='', mripath='', rripath='', ioipath='') -> None:
         """
         Assembler class constructor.
 
         Initializes 7 important properties of the Assembler class:
-        -   self.__address_symbol_table (dict): stores labels (scanned in the first pass)
-            as keys and their locations as values.
-        -   self.__bin (dict): stores locations (or addresses) as keys and the binary 
-            representations of the instructions at these locations (job of the second pass) 
-            as values.
+        -   self.__address_symbol_table (dict): stores labels (scanned while assembling)
+            without their trailing comma as keys and their 12-bit binary locations as
+            values. MRI operands are resolved against this table.
+        -   self.__bin_entries (list): stores (location, binary representation) tuples of
+            the assembled instructions in the order they were translated. The bin
+            property exposes them as a dict with locations (or addresses) as keys.
         -   self.__asmfile (str): the file name of the assembly code file. This property
             is initialized and defined in the read_code() method.
         -   self.__asm (list): list of lists, where each outer list represents one line of 
@@ -38,21 +54,23 @@ class Assembler(object):
             separate line. Their must be no empty lines in this file.
         """
         super().__init__()
-        # Address symbol table dict -> {symbol: location}
+        # Address symbol table dict -> {symbol: 12-bit binary location}
         self.__address_symbol_table = {}
-        # Assembled machine code dict -> {location: binary representation}
-        self.__bin = {}
+        # Assembled machine code list -> [(location, binary representation)]
+        self.__bin_entries = []
         # Load assembly code if the asmpath argument was provided.
         if asmpath:
             self.read_code(asmpath)
             # memory-reference instructions
-        self.__mri_table = self.__load_table(mripath) if mripath else {}
+        self.__mri_table = self.__load_table(mripath, 3) if mripath else {}
         # register-reference instructions
-        self.__rri_table = self.__load_table(rripath) if rripath else {}
+        self.__rri_table = self.__load_table(rripath, 16) if rripath else {}
         # input-output instructions
-        self.__ioi_table = self.__load_table(ioipath) if ioipath else {}
+        self.__ioi_table = self.__load_table(ioipath, 16) if ioipath else {}
         # pseudo instructions
         self.pseudo_table = ['org', 'end', 'hex', 'dec']
+        # Merged dispatch table -> {instruction: (kind, binary representation)}
+        self.__dispatch = self.__build_dispatch()
 
     def read_code(self, path: str):
         """
@@ -62,10 +80,16 @@ class Assembler(object):
         assert path.endswith('.asm') or path.endswith('.S'), \
             'file provided does not end with .asm or .S'
         self.__asmfile = path.split('/')[-1]  # on unix-like systems
-        with open(path, 'r') as f:
-            # remove '\n' from each line, convert it to lower case, and split
-            # it by the whitespaces between the symbols in that line.
-            self.__asm = [s.rstrip().lower().split() for s in f.readlines()]
+        with open(path, 'rb') as f:
+            # read the raw bytes, convert them to lower case at once and
+            # decode the whole buffer a single time.
+            text = f.read().lower().decode()
+        # remove comments from the whole code at once.
+        text = _COMMENT_RE.sub('', text)
+        # split the code into lines, and each line into its symbols.
+        # intern symbols so repeated instructions and labels share one object
+        # (and its cached hash) during table lookups.
+        self.__asm = [[sys.intern(t) for t in line.split()] for line in text.splitlines()]
 
     def assemble(self, inp='') -> dict:
         assert self.__asm or inp, 'no assembly file provided'
@@ -75,129 +99,113 @@ class Assembler(object):
         # if assembly file was not loaded, load it.
         if not self.__asm:
             self.read_code(inp)
-        # remove comments from loaded assembly code.
-        self.__rm_comments()
-        # do first pass.
-        self.__first_pass()
-        # do second pass.
-        self.__second_pass()
-        # The previous two calls should store the assembled binary
-        # code inside self.__bin. So the final step is to return
-        # self.__bin
-        return self.__bin
-
-    # PRIVATE METHODS
-    def __load_table(self, path) -> dict:
-        """
-        loads any of ISA tables (MRI, RRI, IOI)
-        """
-        with open(path, 'r') as f:
-            t = [s.rstrip().lower().split() for s in f.readlines()]
-        return {opcode: binary for opcode, binary in t}
+        # scan and translate the code in a single pass.
+        self.__assemble_one_pass()
+        # The previous call should store the assembled binary
+        # code inside self.__bin_entries. So the final step is to return
+        # it as a dict.
+        return self.bin
 
-    def __islabel(self, string) -> bool:
+    @property
+    def bin(self) -> dict:
         """
-        returns True if string is a label (ends with ,) otherwise False
+        returns the assembled machine code as a dict -> {location: binary representation}
         """
-        return string.endswith(',')
+        return dict(self.__bin_entries)
 
-    def __rm_comments(self) -> None:
+    # PRIVATE METHODS
+    def __load_table(self, path, bits: int) -> dict:
         """
-        remove comments from code
+        loads any of ISA tables (MRI, RRI, IOI), and checks once that every binary
+        representation is a string of exactly bits binary digits (3 for the MRI
+        opcodes, 16 for RRI and IOI instructions).
         """
-        for i in range(len(self.__asm)):
-            for j in range(len(self.__asm[i])):
-                if self.__asm[i][j].startswith('/'):
-                    del self.__asm[i][j:]
-                    break
+        with open(path, 'r') as f:
+            t = [s.rstrip().lower().split() for s in f.readlines()]
+        table = {}
+        for opcode, binary in t:
+            if len(binary) != bits or binary.strip('01'):
+                raise Exception("Bad binary representation of {} in {}".format(opcode, path))
+            table[sys.intern(opcode)] = binary
+        return table
 
-    def __format2bin(self, num: str, numformat: str, format_bits: int) -> str:
-        """
-        converts num from numformat (hex or dec) to binary representation with
-        max format_bits. If the number after conversion is less than format_bits
-        long, the formatted text will be left-padded with zeros.
-        Arguments:
-            num (str): the number to be formatted as binary. It can be in either
-                        decimal or hexadecimal format.
-            numformat (str): the format of num; either 'hex' or 'dec'.
-            format_bits (int): the number of bits you want num to be converted to
-        """
-        if numformat == 'dec':
-            return '{:b}'.format(int(num)).zfill(format_bits)
-        elif numformat == 'hex':
-            return '{:b}'.format(int(num, 16)).zfill(format_bits)
-        else:
-            raise Exception('format2bin: not supported format provided.')
+    def __build_dispatch(self) -> dict:
+        """
+        merges the pseudo instructions and the ISA tables (MRI, RRI, IOI) into a
+        single dict mapping each instruction to a (kind, binary) tuple. Earlier
+        tables take precedence over later ones if an instruction is duplicated.
+        """
+        dispatch = {'org': (PSEUDO_ORG, None), 'end': (PSEUDO_END, None),
+                    'dec': (PSEUDO_DEC, None), 'hex': (PSEUDO_HEX, None)}
+        for kind, table in ((MRI, self.__mri_table), (RRI, self.__rri_table), (IOI, self.__ioi_table)):
+            for opcode, binary in table.items():
+                dispatch.setdefault(opcode, (kind, binary))
+        return dispatch
 
-    def __first_pass(self) -> None:
-        """
-        Runs the first pass over the assmebly code in self.__asm.
-        Should search for labels, and store the labels alongside their locations in
-        self.__address_symbol_table. The location must be in binary (not hex or dec).
+    def __assemble_one_pass(self) -> None:
+        """
+        Runs a single pass over the assembly code in self.__asm.
+        Stores every label alongside its 12-bit binary location in
+        self.__address_symbol_table, and translates every instruction into its
+        binary representation using the dispatch table. The translated instruction
+        is stored alongside its location (in binary too) in self.__bin_entries.
+        MRI operands are deferred: a placeholder keeps their position in
+        self.__bin_entries and they are resolved once the whole code has been
+        scanned, so every reference uses the last definition of a label.
         Returns None
         """
         LC = int('0', 16)
-        valid_inst = list(self.__ioi_table.keys()) + list(self.__rri_table.keys()) + list(self.__mri_table.keys()) + \
-                     self.pseudo_table
+        bin_out = self.__bin_entries = []
+        emit = bin_out.append
+        symbols = self.__address_symbol_table
+        lookup = self.__dispatch.get
+        intern = sys.intern
+        # Deferred MRI references -> [(index in bin_out, location, I, opcode, operand)]
+        pending = []
 
-        for i in range(len(self.__asm)):
-            code = self.__asm[i][0]
-            if code not in valid_inst and not self.__islabel(code):
+        for i, line in enumerate(self.__asm):
+            code = line[0]
+            is_label = code[-1:] == ','
+            if not is_label and lookup(code) is None:
                 raise Exception("Bad input at line: {}".format(i + 1))
-            if self.__islabel(code):
-                self.__address_symbol_table[code] = LC
-                LC += 1
-            else:
-                if code == "org":
-                    LC = int(self.__asm[i][-1], 16)
-                elif code == "end":
-                    return
-                else:
-                    LC += int('1', 16)
+            LC_add = format(LC, _F12)
+            if is_label:
+                # store the label without its trailing comma, as it is referenced.
+                label = intern(code[:-1])
+                symbols[label] = LC_add
+            # logical instruction view of the line (without its label).
+            tokens = line[1:] if is_label else line
+            last = tokens[-1]
+            kind, payload = lookup(tokens[0], _UNKNOWN_ENTRY)
+            if kind == PSEUDO_ORG:
+                LC = int(last, 16)
+                continue
+            elif kind == PSEUDO_END:
+                break
+            elif kind == PSEUDO_DEC:
+                emit((LC_add, format(int(last), _F16)))
+            elif kind == PSEUDO_HEX:
+                emit((LC_add, format(int(last, 16), _F16)))
+            elif kind == MRI:
+                opcode = payload
+                # symbols are lower case, so the indirect flag reads as 'i'.
+                has_I = len(tokens) > 2 and last == 'i'
+                I = '1' if has_I else '0'
+                loc_eff = tokens[-2] if has_I else last
+                # a label may be (re)defined further down, and its last definition
+                # applies to every reference, so the operand is resolved after the
+                # sweep. Reserve the slot so the output stays in location order.
+                pending.append((len(bin_out), LC_add, I, opcode, loc_eff))
+                emit((LC_add, ''))
+            elif kind != UNKNOWN:
+                # RRI and IOI map directly to their binary representation.
+                emit((LC_add, payload))
+            LC += 1
 
-    def __second_pass(self) -> None:
-        """
-        Runs the second pass on the code in self.__asm.
-        Should translate every instruction into its binary representation using
-        the tables self.__mri_table, self.__rri_table and self.__ioi_table. It should
-        also store the translated instruction's binary representation alongside its
-        location (in binary too) in self.__bin.
-        """
-        LC = int('0', 16)
-        for i in range(len(self.__asm)):
-            effective_index = 0 if self.__asm[i][0] not in self.__address_symbol_table.keys() else 1
-            LC_add = str(self.__format2bin(str(LC), 'dec', 12))
-            i_eff = self.__asm[i][effective_index]
-            if i_eff in self.pseudo_table:
-                if i_eff == 'org':
-                    LC = int(self.__asm[i][-1], 16)
-                elif i_eff == 'end':
-                    return
-                elif i_eff == 'dec':
-                    self.__bin[LC_add] = str(self.__format2bin(self.__asm[i][-1], 'dec', 16))
-                    LC += 1
-                else:
-                    self.__bin[LC_add] = str(self.__format2bin(self.__asm[i][-1], 'hex', 16))
-                    LC += 1
-            elif i_eff in self.__mri_table.keys():
-                opcode = str(self.__mri_table[i_eff])
-                I = '0'
-                loc_eff = self.__asm[i][-1]
-                if loc_eff == "I":
-                    I = "1"
-                    loc_eff = self.__asm[i][-2]
-                if loc_eff + ',' in self.__address_symbol_table:
-                    location = self.__address_symbol_table[loc_eff + ',']
-                    self.__bin[LC_add] = I + opcode + str(self.__format2bin(str(location), "dec", 12))
-                else:
-                    location = loc_eff
-                    self.__bin[LC_add] = I + opcode + str(self.__format2bin(str(location), "hex", 12))
-                LC += 1
-                pass
-            elif i_eff in self.__rri_table.keys():
-                self.__bin[LC_add] = str(self.__rri_table[i_eff])
-                LC += 1
-                pass
-            elif i_eff in self.__ioi_table.keys():
-                self.__bin[LC_add] = str(self.__ioi_table[i_eff])
-                LC += 1
+        # resolve label references, otherwise the operand is a hex address. Slots
+        # are patched by index, so overlapping ORG regions keep their order.
+        for idx, LC_add, I, opcode, loc_eff in pending:
+            addr_bin = symbols.get(loc_eff)
+            if addr_bin is None:
+                addr_bin = format(int(loc_eff, 16), _F12)
+            bin_out[idx] = (LC_add, f"{I}{opcode}{addr_bin}")
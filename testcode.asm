@@ -18,4 +18,5 @@ STP,    HLT
         ORG 120
 CTR,    HEX 0
 WRD,    HEX 62C1
+        LDA WRD I
         END
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from assembler import Assembler
 
 INPUT_FILE = 'testcode.asm'
@@ -6,6 +9,23 @@ MRI_FILE = 'mri.txt'
 RRI_FILE = 'rri.txt'
 IOI_FILE = 'ioi.txt'
 
+
+def assemble_source(source: bytes) -> dict:
+    """
+    writes source to a temporary .asm file and returns its assembled binaries.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'source.asm')
+        with open(path, 'wb') as f:
+            f.write(source)
+        asm = Assembler(asmpath=path, mripath=MRI_FILE, rripath=RRI_FILE, ioipath=IOI_FILE)
+        return asm.assemble()
+
+
+def check(name: str, passed: bool) -> None:
+    print(name + ': ' + ('TEST PASSED' if passed else 'TEST FAILED'))
+
+
 if __name__ == "__main__":
     bin_text = ''
     asm = Assembler(asmpath=INPUT_FILE, \
@@ -17,4 +37,46 @@ if __name__ == "__main__":
     for lc in binaries:
         bin_text += lc + '\t' + binaries[lc] + '\n'
     with open(OUT_FILE, 'r') as f:
-        print('TEST PASSED' if f.read() == bin_text else 'TEST FAILED')
\ No newline at end of file
+        print('TEST PASSED' if f.read() == bin_text else 'TEST FAILED')
+
+    # comments must end at the line break, whatever the line endings are.
+    expected = {'000100000000': '0111100000000000',
+                '000100000001': '0010000100000010',
+                '000100000010': '0000000000000101'}
+    for name, eol in (('CR line endings', b'\r'), ('CRLF line endings', b'\r\n')):
+        source = eol.join([b'ORG 100 /start', b'CLA /comment', b'LDA X', b'X, HEX 5 /five', b'END', b''])
+        check(name, assemble_source(source) == expected)
+
+    # the last definition of a label applies to every reference.
+    source = b'\n'.join([b'ORG 100', b'X, HEX 1', b'LDA X', b'X, HEX 2', b'END'])
+    expected = {'000100000000': '0000000000000001',
+                '000100000001': '0010000100000010',
+                '000100000010': '0000000000000010'}
+    check('Redefined label', assemble_source(source) == expected)
+
+    # a later instruction at the same location replaces a deferred reference.
+    source = b'\n'.join([b'ORG 100', b'LDA F', b'ORG 100', b'CLA', b'F, HEX 5', b'END'])
+    expected = {'000100000000': '0111100000000000',
+                '000100000001': '0000000000000101'}
+    check('Overlapping ORG', assemble_source(source) == expected)
+
+    # a label named I is an operand, not the indirect addressing flag.
+    source = b'\n'.join([b'ORG 100', b'LDA I', b'LDA I I', b'I, HEX 5', b'END'])
+    expected = {'000100000000': '0010000100000010',
+                '000100000001': '1010000100000010',
+                '000100000010': '0000000000000101'}
+    check('Label named I', assemble_source(source) == expected)
+
+    # instruction tables are validated when they are loaded; the shipped
+    # tables were loaded above, so only a malformed table must raise here.
+    for name, content in (('Short MRI opcode', b'lda 01\n'), ('Non-binary MRI opcode', b'lda 0a1\n')):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'mri.txt')
+            with open(path, 'wb') as f:
+                f.write(content)
+            try:
+                Assembler(mripath=path, rripath=RRI_FILE, ioipath=IOI_FILE)
+            except Exception as e:
+                check(name, str(e).startswith('Bad binary representation'))
+            else:
+                check(name, False)